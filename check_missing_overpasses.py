@@ -2,12 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import os
-import re
 import csv
 import argparse
-from typing import Optional, List
+from typing import Optional, List, Iterable, Iterator, Set
 from datetime import datetime, timedelta
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # Default data root (can be overridden with --data_root)
 DATA_ROOT = "/Dedicated/jwang-data2/shared_satData/OPNL_FILDA/DATA/LEV1B"
@@ -25,65 +25,90 @@ PRODUCTS_INFO = {
     "MYD03":    {"interval": 5},
 }
 
+# Granule file endings recognised when scanning day directories
+ALLOWED_EXT = (".nc", ".hdf", ".hdf5", ".h4", ".h5")
+
 def generate_expected_times(interval_minutes: int) -> List[str]:
     return [f"{h:02d}{m:02d}" for h in range(24) for m in range(0, 60, interval_minutes)]
 
+# Expected HHMM slots per product, built once at import and shared read-only across threads
+for _info in PRODUCTS_INFO.values():
+    _info["expected_times"] = tuple(generate_expected_times(_info["interval"]))
+    _info["expected_set"] = frozenset(_info["expected_times"])
+
 def get_doy(dt) -> int:
     return dt.timetuple().tm_yday
 
-def list_times_for_date(product: str, date, data_root: Path) -> List[str]:
+def list_times_for_date(product: str, date, data_root: Path) -> Set[str]:
     year = date.year
     doy = f"{get_doy(date):03d}"
     path = Path(data_root) / product / f"{year}" / doy
     if not path.exists():
-        return []
-
-    filenames = os.listdir(path)
-    # Match: <PRODUCT>.AYYYYDOY.HHMM.*.<ext> for common HDF/NetCDF endings
-    pattern = re.compile(
-        rf"{re.escape(product)}\.A{year}{doy}\.(\d{{4}})\..*\.(nc|hdf|hdf5|h4|h5)$",
-        re.IGNORECASE,
-    )
-    times = []
-    for f in filenames:
-        m = pattern.match(f)
-        if m:
-            times.append(m.group(1))
-    return sorted(set(times))
-
-def check_files(product: str, start_date: str, end_date: Optional[str], data_root: Path) -> List[dict]:
-    results: List[dict] = []
+        return set()
+
+    # Match: <PRODUCT>.AYYYYDOY.HHMM.*.<ext> for common HDF/NetCDF endings.
+    # A fixed prefix test plus an extension check avoids a regex match per entry.
+    prefix = f"{product}.A{year}{doy}.".upper()
+    plen = len(prefix)
+    times = set()
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            if name[:plen].upper() != prefix or not name.lower().endswith(ALLOWED_EXT):
+                continue
+            # Same shape as the old regex / present_from_disk: HHMM, a dot, then at least
+            # one more dot-separated field before the extension
+            hhmm = name[plen:plen + 4]
+            if hhmm.isdigit() and name[plen + 4:plen + 5] == "." and "." in name[plen + 5:]:
+                times.add(hhmm)
+    return times
+
+def check_files(
+    product: str,
+    start_date: str,
+    end_date: Optional[str],
+    data_root: Path,
+    max_workers: int = 16,
+) -> Iterator[dict]:
+    """
+    Yield one report row per date so rows can be written as they are produced.
+    Day directories are scanned concurrently (max_workers threads); rows keep date order.
+    """
     interval = PRODUCTS_INFO[product]["interval"]
-    expected_times = generate_expected_times(interval)
+    expected_set = PRODUCTS_INFO[product]["expected_set"]
 
     start = datetime.strptime(start_date, "%Y-%m-%d").date()
     end = datetime.strptime(end_date or start_date, "%Y-%m-%d").date()
-    delta = timedelta(days=1)
-
-    d = start
-    while d <= end:
-        present_times = list_times_for_date(product, d, data_root)
-        missing_times = sorted(set(expected_times) - set(present_times))
-        results.append({
-            "date": d.strftime("%Y-%m-%d"),
-            "product": product,
-            "interval_min": interval,
-            "num_files": len(present_times),
-            "num_missing": len(missing_times),
-            "missing_overpasses": " ".join(missing_times),
-        })
-        d += delta
-
-    return results
-
-def save_to_csv(rows: List[dict], output_file: Path) -> None:
-    if not rows:
+    ndays = (end - start).days + 1
+    dates = [start + timedelta(days=k) for k in range(ndays)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        listings = ex.map(lambda day: list_times_for_date(product, day, data_root), dates)
+        for d, present_times in zip(dates, listings):
+            if len(present_times) >= len(expected_set) and expected_set.issubset(present_times):
+                missing_times = []  # day fully covered: skip the difference and sort
+            else:
+                missing_times = sorted(expected_set.difference(present_times))
+            yield {
+                "date": d.strftime("%Y-%m-%d"),
+                "product": product,
+                "interval_min": interval,
+                "num_files": len(present_times),
+                "num_missing": len(missing_times),
+                "missing_overpasses": " ".join(missing_times),
+            }
+
+def save_to_csv(rows: Iterable[dict], output_file: Path) -> None:
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
         print("No data to save.")
         return
     output_file.parent.mkdir(parents=True, exist_ok=True)
     with open(output_file, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+        writer = csv.DictWriter(f, fieldnames=first.keys())
         writer.writeheader()
+        writer.writerow(first)
         writer.writerows(rows)
     print(f" - Report saved to {output_file}")
 
@@ -98,6 +123,7 @@ if __name__ == "__main__":
     parser.add_argument("--data_root", default=DATA_ROOT, help="Base directory where files are stored")
     parser.add_argument("--output", default=None, help="Output CSV file name (optional)")
     parser.add_argument("--output_dir", default=None, help="Directory to place the report (keeps root clean)")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent day-directory scans (default: 16)")
     args = parser.parse_args()
 
     if args.product not in PRODUCTS_INFO:
@@ -116,5 +142,5 @@ if __name__ == "__main__":
         base = f"{args.product}_{args.start}" + (f"_{args.end}" if args.end else "")
         output_file = out_dir / f"{base}_missing.csv"
 
-    results = check_files(args.product, args.start, args.end, data_root)
+    results = check_files(args.product, args.start, args.end, data_root, max_workers=args.workers)
     save_to_csv(results, output_file)
@@ -17,11 +17,14 @@ Config:
 
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List
+from typing import Optional, Set
 import argparse
 import pandas as pd
 import yaml
 import sys
+import os
+
+from laads_utils import read_infor, scan_product_year
 
 # ------------- helpers -------------
 def load_config(path: str) -> dict:
@@ -34,24 +37,17 @@ def load_config(path: str) -> dict:
 def date_to_doy(dt) -> int:
     return dt.timetuple().tm_yday
 
-def _norm_cols(df: pd.DataFrame) -> dict:
-    """Map lowercased column names to original for robust access."""
-    return {c.lower(): c for c in df.columns}
-
-def _required(df: pd.DataFrame, choices: List[str]) -> str:
-    """
-    Return the actual column name (original case) for one of the expected choices (case-insensitive).
-    Raises if none found.
-    """
-    colmap = _norm_cols(df)
-    for want in choices:
-        if want.lower() in colmap:
-            return colmap[want.lower()]
-    raise KeyError(f"Missing required column; looked for one of: {choices}")
-
-def missing_for_date(product: str, day: datetime.date, data_root: Path, infor_root: Path) -> pd.DataFrame:
+def missing_for_date(
+    product: str,
+    day: datetime.date,
+    data_root: Path,
+    infor_root: Path,
+    present: Optional[Set[str]] = None,
+) -> pd.DataFrame:
     """
     For one date, read the INFOR CSV and compare to local files. Return a DataFrame of missing rows.
+    present: file names already listed for this day (see scan_product_year); if None the
+    day directory is listed here.
     """
     year = day.year
     doy = f"{date_to_doy(day):03d}"
@@ -64,32 +60,23 @@ def missing_for_date(product: str, day: datetime.date, data_root: Path, infor_ro
         return pd.DataFrame(columns=["date","product","name","size","md5sum","downloadsLink","local_path"])
 
     try:
-        df = pd.read_csv(infor_csv)
+        df = read_infor(infor_csv)
     except Exception as e:
         print(f" - Failed to read {infor_csv}: {e}", file=sys.stderr)
         return pd.DataFrame(columns=["date","product","name","size","md5sum","downloadsLink","local_path"])
 
-    # Flexible column access
-    name_col = _required(df, ["name"])
-    size_col = _required(df, ["size"])
-    md5_col  = _required(df, ["md5sum"])
-    link_col = _required(df, ["downloadsLink", "downloadslink"])
-
     # Files present locally (exact filename match)
-    present = set()
-    if data_dir.exists():
-        present = {p.name for p in data_dir.iterdir() if p.is_file()}
+    if present is None:
+        present = set()
+        if data_dir.exists():
+            # DirEntry.is_file() answers from the directory record (d_type), no stat per entry
+            with os.scandir(data_dir) as it:
+                present = {e.name for e in it if e.is_file()}
     # else: directory missing -> everything in CSV is considered missing
 
-    # Rows where file is NOT present locally
-    missing_mask = ~df[name_col].astype(str).isin(present)
-    missing = df.loc[missing_mask, [name_col, size_col, md5_col, link_col]].copy()
-    missing.rename(columns={
-        name_col: "name",
-        size_col: "size",
-        md5_col:  "md5sum",
-        link_col: "downloadsLink",
-    }, inplace=True)
+    # Rows where file is NOT present locally ("name" is already string dtype; no astype needed)
+    missing_mask = ~df["name"].isin(present)
+    missing = df.loc[missing_mask, ["name", "size", "md5sum", "downloadsLink"]].copy()
 
     # Add metadata columns
     missing.insert(0, "date", f"{day:%Y-%m-%d}")
@@ -128,11 +115,18 @@ def main():
         base = f"{args.product}_{start:%Y-%m-%d}" + (f"_{end:%Y-%m-%d}" if end != start else "")
         out_csv = out_dir / f"{base}_missing_urls.csv"
 
+    # List each year's day directories once up front instead of once per date
+    dates = [start + timedelta(days=k) for k in range((end - start).days + 1)]
+    present_by_year = {}
+    for year in sorted({d.year for d in dates}):
+        doys = {f"{date_to_doy(d):03d}" for d in dates if d.year == year}
+        present_by_year[year] = scan_product_year(data_root, args.product, year, doys)
+
     # Loop dates and accumulate
-    day = start
     frames = []
-    while day <= end:
-        miss = missing_for_date(args.product, day, data_root, infor_root)
+    for day in dates:
+        present = present_by_year[day.year].get(f"{date_to_doy(day):03d}", set())
+        miss = missing_for_date(args.product, day, data_root, infor_root, present=present)
         if args.per_day:
             # per-day CSV under output_dir/<product>/<YYYY>/
             per_day_dir = out_dir / args.product / f"{day.year:04d}"
@@ -143,7 +137,6 @@ def main():
             ).to_csv(per_day_csv, index=False)
         if not miss.empty:
             frames.append(miss)
-        day += timedelta(days=1)
 
     # Consolidated CSV
     if frames:
@@ -4,16 +4,25 @@
 
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, List
-import subprocess
+from typing import Optional, List, Set
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import hashlib
 import pandas as pd
-import numpy as np
 import os
 import time
-import copy
 import argparse
 import yaml
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import blake3  # optional: faster digest for locally maintained manifests
+except ImportError:
+    blake3 = None
+
+from laads_utils import read_infor, scan_product_year
+from rate_limiter import RateLimiter
 
 # -----------------------------
 # Config
@@ -37,33 +46,75 @@ TOKEN = os.getenv("NASA_EARTHDATA_TOKEN") or (token)
 def date_to_doy(dt):
     return dt.timetuple().tm_yday
 
-def md5sum(filename: str, blocksize: int = 65536) -> str:
-    md5 = hashlib.md5()
+def _new_hasher(algo: str = "md5"):
+    """
+    Hash object for integrity checks. 'md5' matches LAADS-provided md5sum values;
+    'blake3' (optional package) is for locally maintained manifests only.
+    """
+    if algo == "md5":
+        # Not a security use: lets OpenSSL builds with restricted MD5 still serve it
+        try:
+            return hashlib.new("md5", usedforsecurity=False)
+        except TypeError:  # Python < 3.9
+            return hashlib.md5()
+    if algo == "blake3":
+        if blake3 is None:
+            raise RuntimeError("hash_algo 'blake3' requires the blake3 package (pip install blake3)")
+        return blake3.blake3()
+    raise ValueError(f"Unknown hash_algo: {algo!r} (expected 'md5' or 'blake3')")
+
+def file_hash(filename: str, algo: str = "md5", blocksize: int = 1 << 20) -> str:
     with open(filename, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            try:  # whole-file sequential read: let the kernel read ahead aggressively
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+: read/update loop runs in C
+            return hashlib.file_digest(f, lambda: _new_hasher(algo)).hexdigest()
+        hasher = _new_hasher(algo)
         for chunk in iter(lambda: f.read(blocksize), b""):
-            md5.update(chunk)
-    return md5.hexdigest()
-
-def _run_wget(url: str, dest: Path, token: str, wait_s: float = 1.0) -> int:
-    """Run wget with Authorization header; return exit code."""
-    cmd = [
-        "wget",
-        "--no-check-certificate",
-        "-e", "robots=off",
-        "-m", "-np",
-        "-R", ".html,.tmp",
-        "-nH",
-        "--cut-dirs=3",
-        url,
-        "--header", f"Authorization: Bearer {token}",
-        "-O", str(dest),
-    ]
-    print("Running:", " ".join(cmd))
-    rc = subprocess.run(cmd).returncode
-    time.sleep(wait_s)
-    return rc
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def md5sum(filename: str, blocksize: int = 1 << 20) -> str:
+    return file_hash(filename, "md5", blocksize)
+
+def _make_session(token: str, pool_size: int = 16) -> requests.Session:
+    """
+    HTTP session with the Authorization header set once. A pooled adapter keeps up to
+    pool_size keep-alive connections per host (blocking rather than opening more, so
+    the per-host cap holds however many threads share it) and retries transient 5xx.
+    """
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    retry = Retry(total=2, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, pool_block=True, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _download_http(url: str, dest: Path, session: requests.Session, algo: str = "md5") -> Optional[str]:
+    """
+    Stream url to dest over the shared session, hashing while writing.
+    Returns the hex digest (algo) of what was written, or None on failure.
+    """
+    print(f"Downloading: {url}")
+    hasher = _new_hasher(algo)
+    try:
+        with session.get(url, stream=True, timeout=(10, 120)) as r:
+            r.raise_for_status()
+            with open(dest, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1 << 20):
+                    hasher.update(chunk)  # hash first, while the chunk is still hot in cache
+                    f.write(chunk)
+    except (requests.RequestException, OSError) as e:
+        print(f" - Download error for {dest.name}: {e}")
+        return None
+    return hasher.hexdigest()
 
 def _is_nan(x) -> bool:
+    """Defensive check for values not coming from read_infor (which already cleans them)."""
     try:
         # pandas may give np.nan or NaN-like strings
         return pd.isna(x) or (isinstance(x, str) and x.strip().lower() in ("nan", "none", ""))
@@ -75,64 +126,129 @@ def _file_ok(
     expected_size: Optional[int],
     expected_md5: Optional[str],
     verify: str = "auto",
+    digest: Optional[str] = None,
+    algo: str = "md5",
 ) -> bool:
     """
     verify: 'auto' | 'md5' | 'size' | 'none'
+    digest: hash of the file if already known (e.g. hashed while downloading); skips re-reading it.
+    algo:   hash used for the md5sum metadata column ('md5', or 'blake3' for local manifests).
+
+    The size check runs first for every mode that can hash: a size mismatch
+    rules the file out from a single stat, without reading it.
     """
-    if not path.exists():
+    try:
+        st = path.stat()
+    except OSError:
         return False
 
     if verify == "none":
         return True
 
-    if verify == "md5":
-        if expected_md5 and not _is_nan(expected_md5):
-            try:
-                return md5sum(str(path)) == str(expected_md5).strip()
-            except Exception:
-                return False
-        # If no md5 available in metadata, fall back to size if present
-        verify = "size"
-
-    if verify == "auto":
-        if expected_md5 and not _is_nan(expected_md5):
-            try:
-                return md5sum(str(path)) == str(expected_md5).strip()
-            except Exception:
-                return False
-        # else fall through to size
+    if verify not in ("auto", "md5", "size"):
+        # Unknown mode → be conservative
+        return False
 
-    if verify == "size":
-        if expected_size is not None and not _is_nan(expected_size):
-            try:
-                return path.stat().st_size == int(expected_size)
-            except Exception:
+    if expected_size is not None and not _is_nan(expected_size):
+        try:
+            if st.st_size != int(expected_size):
                 return False
-        # If size unavailable, last resort: accept existence
-        return True
+        except Exception:
+            return False
 
-    # Unknown mode → be conservative
-    return False
+    if verify in ("auto", "md5") and expected_md5 and not _is_nan(expected_md5):
+        try:
+            got = digest if digest is not None else file_hash(str(path), algo)
+            return got == str(expected_md5).strip()
+        except Exception:
+            return False
+
+    # No md5 in metadata (or size mode): size matched, or is unavailable → accept existence
+    return True
 
 def _download_with_retries(
     url: str,
     dest: Path,
-    token: str,
+    session: requests.Session,
     expected_size: Optional[int],
     expected_md5: Optional[str],
     verify: str = "auto",
     retries: int = 2,
+    limiter: Optional[RateLimiter] = None,
+    algo: str = "md5",
 ) -> bool:
     """
     Download a file with retries; run integrity check after each attempt.
+    Data is written to <dest>.part and renamed onto dest only once it verifies, so an
+    interrupted or corrupt download never looks like a valid file on the next run.
+    Only failed attempts wait before retrying (exponential backoff, capped at 30 s).
+    limiter, if given, paces request starts across all download threads.
     """
+    part = dest.with_name(dest.name + ".part")
     for attempt in range(retries + 1):
-        rc = _run_wget(url, dest, token)
-        if rc == 0 and _file_ok(dest, expected_size, expected_md5, verify=verify):
+        if limiter is not None:
+            limiter.wait()
+        digest = _download_http(url, part, session, algo)
+        if digest is not None and _file_ok(part, expected_size, expected_md5,
+                                           verify=verify, digest=digest, algo=algo):
+            os.replace(part, dest)
             return True
         print(f" - Integrity check failed (attempt {attempt+1}/{retries+1}); retrying...")
+        if attempt < retries:
+            time.sleep(min(1 << attempt, 30))
+    try:
+        part.unlink()
+    except FileNotFoundError:
+        pass
     return False
 
+def _verify_existing(
+    candidates: List[tuple],
+    verify: str = "auto",
+    algo: str = "md5",
+    max_workers: Optional[int] = None,
+) -> Set[Path]:
+    """
+    Run _file_ok concurrently over (path, expected_size, expected_md5) candidates and
+    return the paths that pass. hashlib releases the GIL while hashing, so threads
+    spread the checksum work over several cores.
+    """
+    if not candidates:
+        return set()
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        oks = ex.map(lambda c: _file_ok(c[0], c[1], c[2], verify=verify, algo=algo), candidates)
+        return {c[0] for c, ok in zip(candidates, oks) if ok}
+
+def _download_many(
+    tasks: List[tuple],
+    session: requests.Session,
+    verify: str = "auto",
+    max_workers: int = 5,
+    limiter: Optional[RateLimiter] = None,
+    algo: str = "md5",
+) -> List[Path]:
+    """
+    Run _download_with_retries concurrently for (url, dest, expected_size, expected_md5) tasks.
+    max_workers bounds concurrent connections to LAADS.
+    Returns the destinations that downloaded and verified OK.
+    """
+    done: List[Path] = []
+    if not tasks:
+        return done
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {
+            ex.submit(_download_with_retries, url, dest, session, size, md5,
+                      verify=verify, limiter=limiter, algo=algo): dest
+            for url, dest, size, md5 in tasks
+        }
+        for fut in as_completed(futures):
+            dest = futures[fut]
+            if fut.result():
+                done.append(dest)
+            else:
+                print(f" - Failed after retries: {dest.name}")
+    return done
+
 # -----------------------------
 # Core
 # -----------------------------
@@ -145,6 +261,10 @@ def download_product_file(
     download_root: str,
     token: str,
     verify: str = "auto",
+    max_workers: int = 5,
+    rate: float = 2.0,
+    hash_algo: str = "md5",
+    hash_workers: Optional[int] = None,
 ) -> List[Path]:
     """
     Download missing/corrupted files between start_date and end_date (inclusive).
@@ -159,12 +279,19 @@ def download_product_file(
     download_root : path where files are actually written (<product>/<YYYY>/<DOY>/)
     token      : Bearer token string (or set NASA_EARTHDATA_TOKEN env)
     verify     : 'auto' | 'md5' | 'size' | 'none'
+    max_workers : concurrent downloads (LAADS tolerates ~5 connections)
+    rate       : maximum request starts per second across all workers (<= 0 disables pacing)
+    hash_algo  : digest stored in the md5sum column: 'md5' (LAADS) or 'blake3' (local manifests)
+    hash_workers : threads verifying files already on disk (None: ThreadPoolExecutor default)
 
     Returns: List[Path] of files that are present (either already existed or downloaded OK)
     """
     token = token or os.getenv("NASA_EARTHDATA_TOKEN")
     if not token:
         raise RuntimeError("No NASA EARTHDATA token provided. Set NASA_EARTHDATA_TOKEN or pass token=...")
+    _new_hasher(hash_algo)  # fail fast on an unknown/unavailable algorithm
+    session = _make_session(token, pool_size=max_workers)
+    limiter = RateLimiter(rate)
 
     start = datetime.strptime(start_date, "%Y-%m-%d").date()
     end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else start
@@ -172,10 +299,25 @@ def download_product_file(
         raise ValueError("end_date must be after or equal to start_date")
 
     results: List[Path] = []
+
+    # List each year's day directories under DATA_ROOT (and a separate download root) once
+    # up front; per-file stats and checksums then only run for names known to exist
+    dates = [start + timedelta(days=k) for k in range((end - start).days + 1)]
+    same_root = Path(download_root).resolve() == Path(data_root).resolve()
+    present_by_year, staged_by_year = {}, {}
+    for year in sorted({d.year for d in dates}):
+        doys = {f"{date_to_doy(d):03d}" for d in dates if d.year == year}
+        present_by_year[year] = scan_product_year(data_root, product, year, doys)
+        if not same_root:
+            staged_by_year[year] = scan_product_year(download_root, product, year, doys)
+
     dt = start
 
     while dt <= end:
         year, doy = dt.year, date_to_doy(dt)
+        present = present_by_year[year].get(f"{doy:03d}", set())
+        # Same root: dest is the file just checked in DATA_ROOT, so there is no staged copy
+        staged = set() if same_root else staged_by_year[year].get(f"{doy:03d}", set())
 
         # INFOR CSV for the day
         infor_file = Path(infor_root) / product / f"{year:04d}" / f"{dt:%Y-%m-%d}.csv"
@@ -193,44 +335,41 @@ def download_product_file(
             continue
 
         try:
-            df = pd.read_csv(infor_file)
-        except Exception as e:
-            print(f" - Failed to read INFOR CSV {infor_file}: {e}")
+            df = read_infor(infor_file)
+        except KeyError:
+            print(f" - INFOR CSV missing required columns in {infor_file}")
             dt += timedelta(days=1)
             continue
-
-        cols = {c.lower(): c for c in df.columns}
-        name_col = cols.get("name", "name")
-        size_col = cols.get("size", "size")
-        md5_col  = cols.get("md5sum", "md5sum")
-        link_col = cols.get("downloadslink", "downloadsLink")
-
-        required_ok = all(c in df.columns for c in [name_col, size_col, md5_col, link_col])
-        if not required_ok:
-            print(f" - INFOR CSV missing required columns in {infor_file}")
+        except Exception as e:
+            print(f" - Failed to read INFOR CSV {infor_file}: {e}")
             dt += timedelta(days=1)
             continue
 
         # Compare count against DATA_ROOT contents for visibility
-        current_count = len(os.listdir(data_dir)) if data_dir.exists() else 0
+        current_count = len(present)
         print(f" - Checking date {dt} for {current_count}/{df.shape[0]} files")
 
-        for _, row in df.iterrows():
-            fname = str(row[name_col])
-            url   = str(row[link_col]).strip()
-
-            try:
-                expected_size = int(row[size_col]) if not _is_nan(row[size_col]) else None
-            except Exception:
-                expected_size = None
-
-            expected_md5 = None if _is_nan(row[md5_col]) else str(row[md5_col]).strip()
-
-            # --- Presence check is ALWAYS against DATA_ROOT ---
+        # Column-wise extraction into plain (name, url, size, md5) tuples; read_infor has
+        # already typed size and cleaned md5sum, so missing values are just <NA> -> None.
+        # Rows without a file name cannot be checked or downloaded.
+        df = df[df["name"].notna()]
+        entries = list(zip(
+            df["name"].tolist(),
+            df["downloadsLink"].str.strip().tolist(),
+            df["size"].astype("object").where(df["size"].notna(), None).tolist(),
+            df["md5sum"].astype("object").where(df["md5sum"].notna(), None).tolist(),
+        ))
+
+        # --- Presence check is ALWAYS against DATA_ROOT; existing files are verified in parallel ---
+        valid = _verify_existing(
+            [(data_dir / fname, size, md5) for fname, _, size, md5 in entries if fname in present],
+            verify=verify, algo=hash_algo, max_workers=hash_workers,
+        )
+
+        tasks = []
+        for fname, url, expected_size, expected_md5 in entries:
             check_path = data_dir / fname
-            need_download = not _file_ok(check_path, expected_size, expected_md5, verify=verify)
-
-            if not need_download:
+            if check_path in valid:
                 # Already present and valid in DATA_ROOT → nothing to do
                 results.append(check_path)
                 continue
@@ -239,18 +378,16 @@ def download_product_file(
             dest = download_dir / fname
 
             # If it's already valid in download_dir (staging), skip re-download
-            if _file_ok(dest, expected_size, expected_md5, verify=verify):
+            if fname in staged and _file_ok(dest, expected_size, expected_md5, verify=verify, algo=hash_algo):
                 print(f"- Already staged in output_dir: {dest.name}")
                 results.append(dest)
                 continue
 
             print(f" - Missing/bad in DATA_ROOT for {dt}: {fname} → downloading to output_dir")
-            success = _download_with_retries(url, dest, token, expected_size, expected_md5, verify=verify)
-            if success:
-                results.append(dest)
-            else:
-                print(f" - Failed after retries: {fname}")
+            tasks.append((url, dest, expected_size, expected_md5))
 
+        results.extend(_download_many(tasks, session, verify=verify,
+                                      max_workers=max_workers, limiter=limiter, algo=hash_algo))
         dt += timedelta(days=1)
 
     return results
@@ -263,12 +400,18 @@ if __name__ == "__main__":
     parser.add_argument("product", help="Product short name (e.g., VJ103IMG)")
     parser.add_argument("--start", required=True, help="Start date YYYY-MM-DD")
     parser.add_argument("--end", default=None, help="End date YYYY-MM-DD (default: same as start)")
-    parser.add_argument("--output_dir", default=None, help="Optional custom output directory (download destination)")
+    parser.add_argument("--output_dir", type=Path, default=None, help="Optional custom output directory (download destination)")
     parser.add_argument("--verify", choices=["auto", "md5", "size", "none"], default="size",
                         help="Integrity check method")
+    parser.add_argument("--workers", type=int, default=5, help="Concurrent downloads (default: 5)")
+    parser.add_argument("--rate", type=float, default=2.0, help="Max request starts per second (default: 2)")
+    parser.add_argument("--hash_algo", choices=["md5", "blake3"], default=SETTING.get("hash_algo", "md5"),
+                        help="Digest in the INFOR md5sum column (default: config hash_algo or md5)")
+    parser.add_argument("--hash_workers", type=int, default=None,
+                        help="Threads verifying existing files (default: ThreadPoolExecutor default)")
     args = parser.parse_args()
 
-    download_root = args.output_dir or DATA_ROOT
+    download_root = args.output_dir or Path(DATA_ROOT)
 
     files = download_product_file(
         args.product,
@@ -279,5 +422,9 @@ if __name__ == "__main__":
         download_root=download_root,  # download destination (may be output_dir)
         token=TOKEN,
         verify=args.verify,
+        max_workers=args.workers,
+        rate=args.rate,
+        hash_algo=args.hash_algo,
+        hash_workers=args.hash_workers,
     )
     print("Done. Files present:", len(files))
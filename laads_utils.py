@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared helpers for the LAADS scripts: reading INFOR/<product>/<YYYY>/<YYYY-MM-DD>.csv
+and listing local data directories <data_root>/<product>/<YYYY>/<DOY>/.
+(The request pacer lives in rate_limiter.py so wget-only scripts need not import pandas.)
+
+pyarrow is optional; when installed its multithreaded CSV reader is used (otherwise
+the pandas C engine), and parsed INFOR columns are cached in a .parquet sidecar.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+import functools
+import os
+import threading
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pacsv = None
+    pq = None
+
+# Canonical INFOR columns -> accepted spellings (matched case-insensitively)
+INFOR_COLUMNS: Dict[str, tuple] = {
+    "name":          ("name",),
+    "size":          ("size",),
+    "md5sum":        ("md5sum",),
+    "downloadsLink": ("downloadsLink", "downloadslink"),
+}
+
+INFOR_DTYPES = {"name": "string", "size": "Int64", "md5sum": "string", "downloadsLink": "string"}
+
+# Parquet schema metadata key recording which CSV (size, mtime) a sidecar was built from;
+# the suffix is bumped whenever _parse_infor_csv output changes so older sidecars are rebuilt
+_SIDECAR_KEY = b"infor_csv_stat.v4"
+
+# Cells read as missing, given explicitly to both CSV readers (pandas' default list) so
+# pyarrow and the pandas fallback agree; pyarrow's own default omits "None"
+_NULL_TOKENS = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# md5sum placeholders LAADS (or hand-edited CSVs) use for "no checksum"
+_MD5_MISSING = ("nan", "none", "")
+
+
+def resolve_infor_columns(columns: Iterable[str]) -> Dict[str, str]:
+    """
+    Map each canonical INFOR column to its actual name (original case) in the file.
+    Raises KeyError if one is missing.
+    """
+    colmap = {c.lower(): c for c in columns}
+    resolved = {}
+    for canon, choices in INFOR_COLUMNS.items():
+        for want in choices:
+            if want.lower() in colmap:
+                resolved[canon] = colmap[want.lower()]
+                break
+        else:
+            raise KeyError(f"Missing required column; looked for one of: {list(choices)}")
+    return resolved
+
+
+def _parse_infor_csv(infor_csv: Path) -> pd.DataFrame:
+    """Parse the four INFOR columns from the CSV itself."""
+    header = pd.read_csv(infor_csv, nrows=0)
+    cols = resolve_infor_columns(header.columns)
+    usecols = list(cols.values())
+
+    # Every column is read as text so both readers see the same values; size is converted
+    # below, where one unparseable cell only blanks that cell instead of failing the file
+    if pacsv is not None:
+        table = pacsv.read_csv(
+            str(infor_csv),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=usecols,
+                column_types={c: pa.string() for c in usecols},
+                null_values=_NULL_TOKENS,
+                strings_can_be_null=True,
+            ),
+        )
+        df = table.to_pandas().astype("string")
+    else:
+        df = pd.read_csv(infor_csv, usecols=usecols, dtype="string", engine="c",
+                         keep_default_na=False, na_values=_NULL_TOKENS)
+
+    df = df.rename(columns={actual: canon for canon, actual in cols.items()})
+    df = df[list(INFOR_COLUMNS)]
+
+    # "4052840.0" (pandas round trip through a NaN column) -> 4052840; "abc" -> <NA>
+    size = pd.to_numeric(df["size"].str.strip(), errors="coerce")
+    df["size"] = size.where(size == size.round()).astype("Int64")
+
+    # Clean md5sum once here so callers only need isna(): strip, and NaN-like text -> <NA>
+    md5 = df["md5sum"].str.strip()
+    df["md5sum"] = md5.mask(md5.str.lower().isin(_MD5_MISSING))
+    return df
+
+
+def read_infor(infor_csv: Path, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Read the name/size/md5sum/downloadsLink columns of an INFOR CSV.
+    Columns come back under their canonical names with dtypes from INFOR_DTYPES;
+    md5sum is stripped, with placeholders such as "nan"/"none"/"" turned into <NA>.
+
+    With pyarrow installed the result is cached as <YYYY-MM-DD>.parquet next to the CSV,
+    tagged with the CSV's size and mtime; the sidecar is reused only while those match.
+    Results are also memoized in-process on (path, size, mtime), so treat the returned
+    frame as read-only.
+    """
+    infor_csv = Path(infor_csv)
+    if not use_cache:
+        return _parse_infor_csv(infor_csv)
+    st = infor_csv.stat()
+    return _read_infor_cached(str(infor_csv), st.st_size, st.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=64)
+def _read_infor_cached(path: str, size: int, mtime_ns: int) -> pd.DataFrame:
+    """Sidecar-backed read; size and mtime_ns are part of the cache key so edits invalidate it."""
+    infor_csv = Path(path)
+    if pq is None:
+        return _parse_infor_csv(infor_csv)
+
+    stamp = f"{size}:{mtime_ns}".encode()
+    sidecar = infor_csv.with_suffix(".parquet")
+    try:
+        table = pq.read_table(sidecar)
+        if (table.schema.metadata or {}).get(_SIDECAR_KEY) == stamp:
+            return table.to_pandas().astype(INFOR_DTYPES)
+    except (OSError, pa.ArrowException):
+        pass  # no sidecar yet, or unreadable: rebuild it
+
+    df = _parse_infor_csv(infor_csv)
+    # Write under a per-process/thread temporary name and rename into place, so concurrent
+    # readers (e.g. visualize + download on the same day) never see a half-written sidecar
+    tmp = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SIDECAR_KEY: stamp})
+        pq.write_table(table, tmp)
+        os.replace(tmp, sidecar)
+    except (OSError, pa.ArrowException):
+        # e.g. read-only INFOR tree; the parsed frame is still returned
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+    return df
+
+
+def scan_product_year(
+    data_root: Path,
+    product: str,
+    year: int,
+    doys: Optional[Iterable[str]] = None,
+) -> Dict[str, Set[str]]:
+    """
+    List <data_root>/<product>/<YYYY>/ once and return {DOY: set of file names}.
+
+    doys restricts which day directories are opened (e.g. {"183", "184"}); days whose
+    directory does not exist are simply absent from the result.
+    """
+    year_dir = Path(data_root) / product / f"{year:04d}"
+    wanted = set(doys) if doys is not None else None
+    present: Dict[str, Set[str]] = {}
+    try:
+        with os.scandir(year_dir) as it:
+            day_dirs = [e for e in it if (wanted is None or e.name in wanted) and e.is_dir()]
+    except FileNotFoundError:
+        return present
+
+    for entry in day_dirs:
+        with os.scandir(entry.path) as it:
+            present[entry.name] = {e.name for e in it if e.is_file()}
+    return present
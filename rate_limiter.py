@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Thread-safe request pacer for the LAADS granule downloads (standard library only).
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Space request starts at least 1/rate seconds apart across threads.
+    LAADS tolerates a handful of concurrent connections at roughly 2 requests/s.
+    """
+
+    def __init__(self, rate: float = 2.0):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
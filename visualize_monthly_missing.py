@@ -18,40 +18,35 @@ Outputs (in output_dir):
 """
 
 import os
-import re
 import math
+import functools
 import argparse
+import sqlite3
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-import math
+from matplotlib import colors as mcolors
 from matplotlib import patches as mpatches
 from matplotlib.lines import Line2D
 
+from check_missing_overpasses import PRODUCTS_INFO as OVERPASS_INFO
+
 
 
 # ---------- cadence (minutes between granules) ----------
-# Extend as needed
-PRODUCTS_INFO: Dict[str, int] = {
-    # VIIRS (6-min cadence => 240/day)
-    "VNP14IMG": 6,
-    "VJ114IMG": 6,
-    "VJ214IMG": 6,
-    "VNP03IMG": 6,
-    "VJ103IMG": 6,
-    # MODIS (5-min cadence => 288/day)
-    "MOD14": 5,
-    "MYD14": 5,
-    "MOD03": 5,
-    "MYD03": 5,
-}
-
-ALLOWED_EXT = ("nc", "hdf", "hdf5", "h4", "h5")
+# Single source of truth is check_missing_overpasses.PRODUCTS_INFO; extend it there.
+# VIIRS: 6-min cadence => 240/day; MODIS: 5-min cadence => 288/day
+PRODUCTS_INFO: Dict[str, int] = {p: info["interval"] for p, info in OVERPASS_INFO.items()}
+
+ALLOWED_EXT = frozenset({"nc", "hdf", "hdf5", "h4", "h5"})
 
 
 # ---------------- helpers ----------------
@@ -67,6 +62,7 @@ def date_to_doy(d) -> int:
     return d.timetuple().tm_yday
 
 
+@functools.lru_cache(maxsize=None)
 def theoretical_max(product: str) -> int:
     if product not in PRODUCTS_INFO:
         raise ValueError(f"Unknown product '{product}'. Add its cadence to PRODUCTS_INFO.")
@@ -75,15 +71,21 @@ def theoretical_max(product: str) -> int:
 
 
 def expected_from_infor(infor_csv: Path) -> int:
-    """INFOR rows = practical expected count for that day."""
-
-    if not infor_csv.exists():
-        return 0
+    """
+    INFOR rows = practical expected count for that day.
+    Counted as lines minus the header (one row per granule, no embedded newlines),
+    which avoids parsing the CSV at all. Trailing blank lines are ignored, but blank
+    lines in the middle of the file count as rows (pd.read_csv would skip them);
+    LAADS INFOR files have none.
+    """
     try:
-        df = pd.read_csv(infor_csv)
-        return int(df.shape[0])
-    except Exception:
+        with open(infor_csv, "rb") as f:
+            body = f.read().rstrip(b"\r\n")
+    except OSError:
+        return 0
+    if not body:
         return 0
+    return body.count(b"\n")  # newlines between lines = data rows after the header
 
 
 def present_from_disk(product: str, d, data_root: Path) -> int:
@@ -97,15 +99,18 @@ def present_from_disk(product: str, d, data_root: Path) -> int:
     if not day_dir.exists():
         return 0
 
-    pat = re.compile(
-        rf"{re.escape(product)}\.A{year}{doy}\.(\d{{4}})\..*\.({'|'.join(ALLOWED_EXT)})$",
-        re.IGNORECASE,
-    )
+    # Fixed prefix test + split instead of a per-day regex; product match stays case-insensitive
+    prefix = f"{product}.A{year}{doy}.".upper()
+    plen = len(prefix)
     hhmm = set()
-    for name in os.listdir(day_dir):
-        m = pat.match(name)
-        if m:
-            hhmm.add(m.group(1))
+    with os.scandir(day_dir) as it:
+        for entry in it:
+            name = entry.name
+            if name[:plen].upper() != prefix:
+                continue
+            parts = name.split(".")
+            if len(parts) >= 5 and parts[-1].lower() in ALLOWED_EXT and len(parts[2]) == 4 and parts[2].isdigit():
+                hhmm.add(parts[2])
     return len(hhmm)
 
 
@@ -119,30 +124,131 @@ def iter_days(start_str: str, end_str: Optional[str]):
         d += one
 
 
+# --------------- day cache ----------------
+# Day counts keyed on (infor_root, data_root, product, date), stored with stamps of the inputs they came from:
+# INFOR CSV "size:mtime_ns" and the day directory's mtime_ns (its listing changes whenever
+# a granule is added, removed or renamed). A day is recounted only when a stamp changes.
+#
+# Bump when the counting rules change (ALLOWED_EXT, the file-name test, INFOR row count);
+# a cache written under another version is discarded on open.
+_CACHE_VERSION = 2
+
+# Like git's "racy" index entries: on NFS/Lustre mtime may be 1 s granular, so a write landing
+# in the same tick as the stamp would leave it unchanged. Days whose inputs were modified this
+# close to the stamp are counted but not cached.
+_RACY_NS = 2_000_000_000
+
+
+def _stamp(path: Path, with_size: bool = False):
+    """(stamp string, mtime_ns) of path; ("-", None) if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-", None
+    stamp = f"{st.st_size}:{st.st_mtime_ns}" if with_size else str(st.st_mtime_ns)
+    return stamp, st.st_mtime_ns
+
+
+def _open_cache(cache_path: Path) -> sqlite3.Connection:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(cache_path))
+    if con.execute("PRAGMA user_version").fetchone()[0] != _CACHE_VERSION:
+        with con:
+            con.execute("DROP TABLE IF EXISTS day_counts")
+            con.execute(f"PRAGMA user_version = {_CACHE_VERSION}")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS day_counts ("
+        " infor_root TEXT, data_root TEXT, product TEXT, date TEXT, infor_stamp TEXT, data_stamp TEXT,"
+        " infor INTEGER, present INTEGER, PRIMARY KEY (infor_root, data_root, product, date))"
+    )
+    return con
+
+
 # --------------- core ----------------
-def build_daily_table(product: str, start: str, end: Optional[str], infor_root: Path, data_root: Path) -> pd.DataFrame:
-    rows = []
+def _day_counts(product: str, d, infor_root: Path, data_root: Path, cached: Optional[tuple] = None):
+    """
+    (INFOR rows, HHMM present on disk, stamps to cache, reused) for one day; independent of
+    every other day. cached is a previous (infor_stamp, data_stamp, infor, present) row,
+    reused if stamps match. stamps is None when there is nothing (safe) to write back.
+    """
+    infor_csv = infor_root / product / f"{d.year:04d}" / f"{d:%Y-%m-%d}.csv"
+    day_dir = data_root / product / f"{d.year:04d}" / f"{date_to_doy(d):03d}"
+    # Stamp before counting; anything modified within _RACY_NS of now is not trusted to
+    # change its mtime on a later write, so the count is returned but not cached
+    now_ns = time.time_ns()
+    (infor_stamp, infor_mtime), (data_stamp, data_mtime) = _stamp(infor_csv, with_size=True), _stamp(day_dir)
+    stamps = (infor_stamp, data_stamp)
+    if any(m is not None and m >= now_ns - _RACY_NS for m in (infor_mtime, data_mtime)):
+        stamps = None
+    elif cached is not None and cached[:2] == stamps:
+        return cached[2], cached[3], None, True
+    return expected_from_infor(infor_csv), present_from_disk(product, d, data_root), stamps, False
+
+
+def build_daily_table(
+    product: str,
+    start: str,
+    end: Optional[str],
+    infor_root: Path,
+    data_root: Path,
+    max_workers: int = 8,
+    cache_path: Optional[Path] = None,
+) -> pd.DataFrame:
+    """
+    Per-day counts; days are processed concurrently (CSV reads and listings release the GIL).
+    With cache_path (SQLite), days whose INFOR CSV and day directory are unchanged since
+    the last run are taken from the cache instead of being recounted.
+    """
     theo = theoretical_max(product)
-
-    for d in iter_days(start, end):
-        year = d.year
-        infor_csv = infor_root / product / f"{year:04d}" / f"{d:%Y-%m-%d}.csv"
-        infor_cnt = expected_from_infor(infor_csv)
-        present_cnt = present_from_disk(product, d, data_root)
-
-        rows.append({
-            "date": d.strftime("%Y-%m-%d"),
-            "yyyy_mm": f"{d:%Y-%m}",
-            "day": d.day,
-            "product": product,
-            "theory": theo,
-            "infor": infor_cnt,
-            "present": present_cnt,
-            "missing_vs_theory": max(theo - present_cnt, 0),
-            "missing_vs_infor":  max(infor_cnt - present_cnt, 0),
-        })
-
-    df = pd.DataFrame(rows)
+    days = list(iter_days(start, end))
+    n = len(days)
+
+    con = _open_cache(cache_path) if cache_path is not None else None
+    cache: Dict[str, tuple] = {}
+    # Rows from another tree (a mirror or an mtime-preserving copy) must never match
+    roots = (str(Path(infor_root).resolve()), str(Path(data_root).resolve()))
+    if con is not None:
+        cur = con.execute(
+            "SELECT date, infor_stamp, data_stamp, infor, present FROM day_counts"
+            " WHERE infor_root = ? AND data_root = ? AND product = ?",
+            (*roots, product),
+        )
+        cache = {row[0]: row[1:] for row in cur}
+
+    # Fill typed arrays by index, then build the frame once from columns
+    infor_a = np.zeros(n, dtype=np.int64)
+    present_a = np.zeros(n, dtype=np.int64)
+    updates = []
+    reused = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        counts = ex.map(
+            lambda d: _day_counts(product, d, infor_root, data_root, cache.get(f"{d:%Y-%m-%d}")), days)
+        for i, (infor_cnt, present_cnt, stamps, hit) in enumerate(counts):
+            infor_a[i] = infor_cnt
+            present_a[i] = present_cnt
+            reused += hit
+            if stamps is not None:
+                updates.append((*roots, product, f"{days[i]:%Y-%m-%d}", *stamps, int(infor_cnt), int(present_cnt)))
+
+    if con is not None:
+        with con:
+            con.executemany("INSERT OR REPLACE INTO day_counts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", updates)
+        con.close()
+        print(f" - Day cache: {reused}/{n} days reused ({cache_path})")
+
+    dates = pd.DatetimeIndex(np.array(days, dtype="datetime64[D]"))
+    theory_a = np.full(n, theo, dtype=np.int64)
+    df = pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "yyyy_mm": dates.strftime("%Y-%m"),
+        "day": dates.day.to_numpy(dtype=np.int64),
+        "product": product,
+        "theory": theory_a,
+        "infor": infor_a,
+        "present": present_a,
+        "missing_vs_theory": np.maximum(theory_a - present_a, 0),
+        "missing_vs_infor":  np.maximum(infor_a - present_a, 0),
+    })
     return df
 
 
@@ -160,6 +266,12 @@ def plot_daily_by_month(df: pd.DataFrame, product: str, out_png: Path, highlight
 
     df = df.sort_values(["yyyy_mm", "day"])
     months = sorted(df["yyyy_mm"].unique().tolist())
+
+    # Bar colors for every day at once: red where present < basis, else blue (RGBA rows)
+    basis_col = "theory" if highlight_basis == "theory" else "infor"
+    missing_all = (df["present"] < df[basis_col]).to_numpy()
+    rgba_all = np.where(missing_all[:, None], mcolors.to_rgba_array("red"), mcolors.to_rgba_array("tab:blue"))
+    month_all = df["yyyy_mm"].to_numpy()
     n = len(months)
 
     # Grid: 3 columns; rows as needed (e.g., 4x3 for 12 months)
@@ -175,24 +287,15 @@ def plot_daily_by_month(df: pd.DataFrame, product: str, out_png: Path, highlight
         c = idx % cols
         ax = axes[r][c]
 
-        sub = df[df["yyyy_mm"] == month].copy()
+        in_month = month_all == month
+        sub = df[in_month]
         x = sub["day"].to_numpy()
         present = sub["present"].to_numpy()
         infor = sub["infor"].to_numpy()
         theory = sub["theory"].to_numpy()
 
-        # Choose basis for "missing" highlight
-        if highlight_basis == "theory":
-            basis = theory
-        else:
-            basis = infor
-
-        # Color bars red where present < basis, else blue
-        missing_mask = present < basis
-        bar_colors = ["red" if m else "tab:blue" for m in missing_mask]
-
         # Bars: present (no label here; we add custom legend patches later)
-        ax.bar(x, present, color=bar_colors, label="_nolegend_", alpha=0.9)
+        ax.bar(x, present, color=rgba_all[in_month], label="_nolegend_", alpha=0.9)
 
         # INFOR (step)
         step_lines = ax.step(x, infor, where="mid", linewidth=1.5, label="INFOR expected")
@@ -249,6 +352,10 @@ def main():
     ap.add_argument("--output_dir", default="./REPORTS", help="Where to write CSV/PNG (default: ./REPORTS)")
     ap.add_argument("--highlight_basis", choices=["infor", "theory"], default="infor",
                 help="Color days red when present < basis (default: infor)")
+    ap.add_argument("--workers", type=int, default=8, help="Days processed concurrently (default: 8)")
+    ap.add_argument("--cache", default=None,
+                    help="SQLite day-count cache (default: <output_dir>/daily_counts_cache.sqlite)")
+    ap.add_argument("--no_cache", action="store_true", help="Recount every day; do not read or update the cache")
     args = ap.parse_args()
 
     cfg = load_config(args.config)
@@ -261,7 +368,9 @@ def main():
         raise SystemExit(f"Unknown product '{args.product}'. Available: {', '.join(PRODUCTS_INFO.keys())}")
 
     # Build daily table (by day)
-    daily = build_daily_table(args.product, args.start, args.end, infor_root, data_root)
+    cache_path = None if args.no_cache else Path(args.cache or out_dir / "daily_counts_cache.sqlite")
+    daily = build_daily_table(args.product, args.start, args.end, infor_root, data_root,
+                              max_workers=args.workers, cache_path=cache_path)
 
     # Save daily CSV
     csv_name = f"{args.product}_{args.start}" + (f"_{args.end}" if args.end else "") + "_daily_counts.csv"